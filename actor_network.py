@@ -3,6 +3,7 @@
 import numpy as np
 from tensorflow import keras as ks
 from lite_model import LiteModel
+from random_source import rng
 
 
 class ActorNetwork:
@@ -19,13 +20,16 @@ class ActorNetwork:
                  layer_sizes: list,
                  layer_acts: list,
                  optimizer_str: str,
-                 learning_rate: float = 0.003):
+                 learning_rate: float = 0.003,
+                 num_threads: int = None):
         self.board = board  # Sim world object
         self.save_path = save_path  # Path to save weights to
         self.layer_sizes = layer_sizes  # Size of each layer
         self.layer_acts = layer_acts  # Activation function of each layer
         self.optimizer_str = optimizer_str  # Optimizer to use during training
         self.learning_rate = learning_rate  # Learning rate during training
+        # Number of threads of the lite models, None for the default
+        self.num_threads = num_threads
         self.save_count = 0
 
         # Initialize the network according to the config
@@ -40,6 +44,9 @@ class ActorNetwork:
 
         # Create a lite model instance later
         self.lite_model = None
+        # Quantized lite model, only used for the MCTS rollouts. Created when
+        # first needed, as most networks never run rollouts.
+        self.rollout_lite_model = None
         self.compile_network()
 
     def compile_network(self):
@@ -59,8 +66,18 @@ class ActorNetwork:
             optimizer=optimizer,
             loss=ks.losses.CategoricalCrossentropy(),
         )
-        # Create the lite model from the network, used during prediction
-        self.lite_model = LiteModel.from_keras_model(self.model)
+        # Create the lite models from the network, used during prediction
+        self.create_lite_models()
+
+    def create_lite_models(self):
+        """
+        Creates the lite model from the current weights of the network. The
+        rollout lite model of the previous weights is removed, it is created
+        again by propose_action_batch() when needed.
+        """
+        self.lite_model = LiteModel.from_keras_model(
+            self.model, num_threads=self.num_threads)
+        self.rollout_lite_model = None
 
     def propose_action(self, state, get_distribution=False, epsilon=0):
         """
@@ -81,36 +98,65 @@ class ActorNetwork:
         # To facilitate exploration, a very small number is added to the
         # distribution in order to be able to choose an action at random
         # between all the legal moves available.
-        state_as_np = np.array(state).reshape(1, -1)
-        proposed_action_distribution = (self.lite_model.predict(state_as_np) +
-                                        0.00001) * legal_actions_filter
-        if np.random.random() < epsilon:
-            # Choose the action randomly with uniform probability.
-            uniform_distribution = proposed_action_distribution.copy()[0]
-            uniform_distribution[uniform_distribution > 0] = 1
-            uniform_distribution = uniform_distribution / uniform_distribution.sum(
-            )
-            proposed_action_num = np.random.choice(len(uniform_distribution),
-                                                   1,
-                                                   p=uniform_distribution)[0]
+        proposed_action_distribution = (
+            self.lite_model.predict_states([state]) +
+            0.00001) * legal_actions_filter
+        if rng.random() < epsilon:
+            # Choose the action randomly with uniform probability between the
+            # legal actions.
+            proposed_action_num = rng.choice(
+                np.flatnonzero(proposed_action_distribution[0]))
         else:
             # Choose the action with the highest number in the output from the
             # network.
-            proposed_action_num = self.board.get_action_num_from_one_hot(
-                proposed_action_distribution)
+            proposed_action_num = np.argmax(proposed_action_distribution[0])
         # Return the action as a one-hot encoded action
         proposed_action = self.board.get_one_hot_action(proposed_action_num)
         if get_distribution:
             return proposed_action, proposed_action_distribution
         return proposed_action
 
+    def propose_action_batch(self, states, epsilon=0):
+        """
+        Returns a proposed action for each of the given states, like
+        propose_action(), but runs all the states through the network as one
+        batch. Used by the MCTS rollouts, so the quantized lite model is used.
+        The rollout lite model is quantized, since the rollouts only need the
+        best action and not the exact distribution.
+        """
+        if self.rollout_lite_model is None:
+            self.rollout_lite_model = LiteModel.from_keras_model(
+                self.model, quantize=True, num_threads=self.num_threads)
+        # Combine the legal one-hot encoded actions of each state into one
+        # vector per state
+        legal_actions_filter = np.array([
+            np.sum(self.board.get_legal_actions(state), axis=0)
+            for state in states
+        ])
+        proposed_action_distribution = (
+            self.rollout_lite_model.predict_states(states) +
+            0.00001) * legal_actions_filter
+        # For the states chosen for exploration, replace the distribution by
+        # random values for the legal actions. Choosing the largest of these
+        # values chooses a legal action uniformly at random.
+        explore = rng.random(len(states)) < epsilon
+        proposed_action_distribution[explore] = legal_actions_filter[
+            explore] * (1 + rng.random(
+                (explore.sum(), legal_actions_filter.shape[1])))
+        proposed_action_nums = np.argmax(proposed_action_distribution, axis=1)
+        # Return the actions as one-hot encoded actions
+        return [
+            self.board.get_one_hot_action(action_num)
+            for action_num in proposed_action_nums
+        ]
+
     def fit(self, train_x, train_y, epochs):
         """
-        Trains the network on the provided cases and creates a new lite model
+        Trains the network on the provided cases and creates new lite models
         after training is finished.
         """
         self.model.fit(train_x, train_y, epochs=epochs)
-        self.lite_model = LiteModel.from_keras_model(self.model)
+        self.create_lite_models()
 
     def save_weights(self, save_count):
         """
@@ -122,7 +168,7 @@ class ActorNetwork:
     def load_weights(self, save_count=None):
         """
         Attempts to load weights from file. Returns True if weights
-        were loaded successfully. Creates a new lite model after weights have
+        were loaded successfully. Creates new lite models after weights have
         been loaded.
         """
         try:
@@ -132,7 +178,7 @@ class ActorNetwork:
                 self.model.load_weights(filepath=self.save_path +
                                         str(save_count))
             print("Read weights successfully from file")
-            self.lite_model = LiteModel.from_keras_model(self.model)
+            self.create_lite_models()
             return True
         except:  # pylint: disable=bare-except
             print("Could not read weights from file")
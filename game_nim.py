@@ -1,6 +1,25 @@
 """Haakon8855"""
 
-import numpy as np
+# Source of the methods generated by GameNim.specialize(). The number of
+# pieces and the maximum take are filled in as constants.
+SPECIALIZED_SOURCE = """
+def get_child_state(state, action):
+    num_discs = num_discs_from_state[tuple(state)]
+    action_num = max(range({max_take}), key=action.__getitem__)
+    if action_num >= num_discs:
+        raise ValueError("Given action not within legal parameters.")
+    return one_hot_states[num_discs - action_num - 1][1 - state[{pid_index}]]
+
+
+def get_legal_actions(state):
+    return legal_actions[num_discs_from_state[tuple(state)]]
+
+
+def state_is_final(state):
+    return state[0] == 1
+"""
+SPECIALIZED_METHODS = ("get_child_state", "get_legal_actions",
+                       "state_is_final")
 
 
 class GameNim:
@@ -12,13 +31,69 @@ class GameNim:
         self.num_pieces = num_pieces  # N, number of pieces on the board
         self.max_take = max_take  # K, maximium amount of pieces allowed to take
         self.identifier = "nim"
+        # The state space is tiny, so every one-hot encoded state is created
+        # once and looked up by (number of remaining pieces, pid).
+        self.one_hot_states = tuple(
+            tuple(self.create_one_hot_state(num_discs, pid)
+                  for pid in range(2))
+            for num_discs in range(num_pieces + 1))
+        self.num_discs_from_state = {
+            state_oh: num_discs
+            for num_discs, states in enumerate(self.one_hot_states)
+            for state_oh in states
+        }
+        # The legal actions only depend on the number of remaining pieces, so
+        # they are created once and shared as a tuple for each number.
+        self.legal_actions = tuple(
+            self.create_legal_actions(num_discs)
+            for num_discs in range(num_pieces + 1))
+        # The child states and actions of every state, looked up by (number of
+        # remaining pieces, pid).
+        self.all_child_states = tuple(
+            tuple(self.create_all_child_states(num_discs, pid)
+                  for pid in range(2))
+            for num_discs in range(num_pieces + 1))
+        self.specialized = False  # Whether specialize() has been called
+
+    def specialize(self):
+        """
+        Replaces get_child_state, get_legal_actions and state_is_final of
+        this instance with functions generated for its number of pieces and
+        maximum take. The generated functions index the precomputed tables
+        directly, without the method calls and attribute lookups of the
+        general methods.
+        """
+        namespace = {
+            "one_hot_states": self.one_hot_states,
+            "legal_actions": self.legal_actions,
+            "num_discs_from_state": self.num_discs_from_state,
+        }
+        source = SPECIALIZED_SOURCE.format(max_take=self.max_take,
+                                           pid_index=self.num_pieces + 1)
+        exec(compile(source, "<nim_spec>", "exec"), namespace)  # pylint: disable=exec-used
+        for name in SPECIALIZED_METHODS:
+            setattr(self, name, namespace[name])
+        self.specialized = True
+
+    def __getstate__(self):
+        # The generated functions can not be pickled, they are generated
+        # again when unpickling.
+        state = self.__dict__.copy()
+        for name in SPECIALIZED_METHODS:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.specialized:
+            self.specialize()
 
     def get_initial_state(self):
         """
         Returns the initial state of the game.
         State is represented as (number of remaining pieces, pid of next player to move (0 or 1))
         """
-        return tuple(self.get_one_hot_state((self.num_pieces, 0)))
+        return self.get_one_hot_state((self.num_pieces, 0))
 
     def get_state_size(self):
         """
@@ -36,12 +111,15 @@ class GameNim:
         """
         Returns all allowed actions from current state.
         """
-        num_discs = self.get_num_discs_from_one_hot(state)
-        legal_actions_num = list(range(0, min(num_discs, self.max_take)))
-        legal_actions = []
-        for action_num in legal_actions_num:
-            legal_actions.append(self.get_one_hot_action(action_num))
-        return legal_actions
+        return self.legal_actions[self.get_num_discs_from_one_hot(state)]
+
+    def create_legal_actions(self, num_discs):
+        """
+        Creates all allowed actions when the given amount of discs remain.
+        """
+        return tuple(
+            self.get_one_hot_action(action_num)
+            for action_num in range(min(num_discs, self.max_take)))
 
     def get_child_state(self, state, action):
         """
@@ -69,12 +147,21 @@ class GameNim:
         """
         Returns all child states and the action to reach it from the given state.
         """
-        actions = self.get_legal_actions(state)
-        action_state_pairs = []
-        for action in actions:
-            action_state_pairs.append(
-                (action, self.get_child_state(state, action)))
-        return action_state_pairs
+        return self.all_child_states[self.get_num_discs_from_one_hot(state)][
+            state[-1]]
+
+    def create_all_child_states(self, num_discs, pid):
+        """
+        Creates all child states and the action to reach it from the state
+        with the given amount of remaining discs and pid. The pairs are looked
+        up directly in the table of one-hot encoded states instead of decoding
+        the state again for each action.
+        """
+        child_state_pid = 1 - pid
+        return tuple(
+            (self.get_one_hot_action(action_num),
+             self.one_hot_states[num_discs - (action_num + 1)][child_state_pid])
+            for action_num in range(min(num_discs, self.max_take)))
 
     def state_is_final(self, state):
         """
@@ -99,8 +186,13 @@ class GameNim:
         """
         Returns a one-hot encoded vector of the state given the state.
         """
-        pid = state_num[1]  # Extract the pid
-        curr_discs = state_num[0]  # Get the current amount of remaining discs
+        return self.one_hot_states[state_num[0]][state_num[1]]
+
+    def create_one_hot_state(self, curr_discs, pid):
+        """
+        Creates the one-hot encoded vector of the state with the given amount
+        of remaining discs and the given pid.
+        """
         state_oh = [0] * (self.num_pieces + 1)  # Create a list of zeros
         state_oh[curr_discs] = 1  # Set the correct index's value to 1
         state_oh.append(pid)  # Append the pid to the end
@@ -110,9 +202,7 @@ class GameNim:
         """
         Returns the number of remaining discs given a one-hot encoded state.
         """
-        state_oh = state_oh[:-1]  # Remove pid
-        curr_discs = state_oh.index(1)  # Get index of the 1 in the vector
-        return curr_discs
+        return self.num_discs_from_state[tuple(state_oh)]
 
     def get_one_hot_action(self, action_num):
         """
@@ -126,7 +216,9 @@ class GameNim:
         """
         Returns the action as a number given a one-hot encoded action.
         """
-        return np.argmax(action_oh)
+        # The actions are short tuples, so the builtin max is faster than
+        # converting them to numpy arrays for np.argmax.
+        return max(range(len(action_oh)), key=action_oh.__getitem__)
 
     def __str__(self):
         return f"N = {self.num_pieces}, K = {self.max_take}"
@@ -10,23 +10,37 @@ class LiteModel:
     """
 
     @classmethod
-    def from_file(cls, model_path):
+    def from_file(cls, model_path, num_threads=None):
         """
-        Returns a lite model given the path to saved weights.
+        Returns a lite model given the path to saved weights. The interpreter
+        uses num_threads threads, or its own default if None.
         """
-        return LiteModel(tf.lite.Interpreter(model_path=model_path))
+        return LiteModel(
+            tf.lite.Interpreter(model_path=model_path,
+                                num_threads=num_threads))
 
     @classmethod
-    def from_keras_model(cls, kmodel):
+    def from_keras_model(cls, kmodel, quantize=False, num_threads=None):
         """
-        Returns a lite model given a keras model.
+        Returns a lite model given a keras model. If quantize is True, the
+        weights are quantized to int8 (dynamic range quantization), which
+        runs on int8 kernels on the CPU. The interpreter uses num_threads
+        threads, or its own default if None.
         """
         converter = tf.lite.TFLiteConverter.from_keras_model(kmodel)
+        if quantize:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
         tflite_model = converter.convert()
-        return LiteModel(tf.lite.Interpreter(model_content=tflite_model))
+        return LiteModel(
+            tf.lite.Interpreter(model_content=tflite_model,
+                                num_threads=num_threads))
 
-    def __init__(self, interpreter):
+    def __init__(self, interpreter, cache_size: int = 4096):
         self.interpreter = interpreter
+        # Predictions of previously seen states. A lite model is created each
+        # time the weights change, so the cache never holds stale predictions.
+        self.cache = {}
+        self.cache_size = cache_size
         self.interpreter.allocate_tensors()
         input_det = self.interpreter.get_input_details()[0]
         output_det = self.interpreter.get_output_details()[0]
@@ -37,25 +51,61 @@ class LiteModel:
         self.input_dtype = input_det["dtype"]
         self.output_dtype = output_det["dtype"]
 
-    def predict(self, inp):
+    def invoke(self, inp):
         """
-        Returns predictions given an input to the network.
+        Runs the given batch of records through the interpreter and returns
+        the output. The input of the interpreter is only resized when the
+        batch is larger than before, smaller batches are padded with zeros to
+        avoid reallocating the tensors each time the batch size changes.
         """
-        inp = inp.astype(self.input_dtype)
         count = inp.shape[0]
-        out = np.zeros((count, self.output_shape[1]), dtype=self.output_dtype)
-        for i in range(count):
-            self.interpreter.set_tensor(self.input_index, inp[i:i + 1])
-            self.interpreter.invoke()
-            out[i] = self.interpreter.get_tensor(self.output_index)[0]
-        return out
+        if count > self.input_shape[0]:
+            self.interpreter.resize_tensor_input(
+                self.input_index, [count, *self.input_shape[1:]])
+            self.interpreter.allocate_tensors()
+            self.input_shape = self.interpreter.get_input_details()[0]["shape"]
+        elif count < self.input_shape[0]:
+            padding = np.zeros((self.input_shape[0] - count, *inp.shape[1:]),
+                               dtype=self.input_dtype)
+            inp = np.concatenate((inp, padding))
+        self.interpreter.set_tensor(self.input_index, inp)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index)[:count]
+
+    def predict(self, inp):
+        """
+        Returns predictions given an input to the network. All records are
+        run through the interpreter as one batch.
+        """
+        return self.invoke(inp.astype(self.input_dtype))
+
+    def predict_states(self, states):
+        """
+        Like predict(), but for a list of hashable game states. The prediction
+        for each state is cached, and only states not seen before are run
+        through the interpreter. The cache is emptied when it is full.
+        """
+        # The predictions of this call are collected locally, so the states
+        # found in the cache are kept even if the cache is emptied below.
+        # Building the dict also removes duplicates while keeping the order.
+        found = dict.fromkeys(states)
+        unseen = []
+        for state in found:
+            if state in self.cache:
+                found[state] = self.cache[state]
+            else:
+                unseen.append(state)
+        if unseen:
+            predictions = self.predict(np.array(unseen))
+            found.update(zip(unseen, predictions))
+            if len(self.cache) + len(unseen) > self.cache_size:
+                self.cache.clear()
+            self.cache.update(zip(unseen, predictions))
+        return np.array([found[state] for state in states])
 
     def predict_single(self, inp):
         """
         Like predict(), but only for a single record. The input data can be a Python list.
         """
         inp = np.array([inp], dtype=self.input_dtype)
-        self.interpreter.set_tensor(self.input_index, inp)
-        self.interpreter.invoke()
-        out = self.interpreter.get_tensor(self.output_index)
-        return out[0]
\ No newline at end of file
+        return self.invoke(inp)[0]
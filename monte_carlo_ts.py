@@ -1,178 +1,474 @@
 """Haakon8855"""
 
 import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def select_action_num(node, player_signs, visit_counts_s, visit_counts_sa,
+                      virtual_visits_s, virtual_visits_sa, heuristic,
+                      legal_mask, exploration, sqrt_log_visits,
+                      inv_sqrt_visits):
+    """
+    Selects an action to perform when walking down the tree. Actions never
+    performed before, or actions which have been performed relatively few
+    number of times are favoured. Returns the action number.
+    The exploration term sqrt(log(1 + N(s)) / (1 + N(s, a))) is split into
+    the two lookup tables sqrt_log_visits and inv_sqrt_visits, indexed by
+    the visit counts. The visit counts include the virtual visits of the
+    unfinished simulations in the batch, and each virtual visit counts as a
+    loss for the player to move (virtual loss), so the following simulations
+    in the batch are steered towards other actions.
+    """
+    chosen_action_num = -1
+    chosen_action_value = 0.0
+    node_exploration = exploration * sqrt_log_visits[visit_counts_s[node] +
+                                                     virtual_visits_s[node]]
+    for action_num in range(legal_mask.shape[1]):
+        if not legal_mask[node, action_num]:
+            continue
+        # Black maximizes and red minimizes the reward. Flipping the sign of
+        # the heuristic for red lets both players maximize.
+        action_value = player_signs[node] * heuristic[node, action_num]
+        visits = visit_counts_sa[node, action_num]
+        virtual_visits = virtual_visits_sa[node, action_num]
+        if virtual_visits > 0:
+            # Mean of the real outcomes and a loss for each virtual visit
+            action_value = (visits * action_value -
+                            virtual_visits) / (visits + virtual_visits)
+        action_value += node_exploration * inv_sqrt_visits[visits +
+                                                           virtual_visits]
+        if chosen_action_num < 0 or action_value > chosen_action_value:
+            chosen_action_num = action_num
+            chosen_action_value = action_value
+    return chosen_action_num
+
+
+@njit(cache=True)
+def walk_tree(node, player_signs, visit_counts_s, visit_counts_sa,
+              virtual_visits_s, virtual_visits_sa, heuristic, legal_mask,
+              children, exploration, sqrt_log_visits, inv_sqrt_visits,
+              path_nodes, path_actions, depth):
+    """
+    Walks down the tree from the given node for as long as the chosen child
+    nodes are known, writing the visited nodes and performed actions to the
+    path arrays from index depth. Returns the new depth of the path, the
+    child of the last node in the path is not known.
+    """
+    while node >= 0:
+        action_num = select_action_num(node, player_signs, visit_counts_s,
+                                       visit_counts_sa, virtual_visits_s,
+                                       virtual_visits_sa, heuristic,
+                                       legal_mask, exploration,
+                                       sqrt_log_visits, inv_sqrt_visits)
+        path_nodes[depth] = node
+        path_actions[depth] = action_num
+        depth += 1
+        node = children[node, action_num]
+    return depth
+
+
+@njit(cache=True)
+def add_virtual_visits(path_nodes, path_actions, num_actions,
+                       virtual_visits_s, virtual_visits_sa):
+    """
+    Adds one virtual visit to the first num_actions nodes and actions of the
+    path. Used for paths whose rollouts have not finished yet, the virtual
+    visits are turned into real visits by backup.
+    """
+    for i in range(num_actions):
+        virtual_visits_s[path_nodes[i]] += 1
+        virtual_visits_sa[path_nodes[i], path_actions[i]] += 1
+
+
+@njit(cache=True)
+def backup(path_nodes, path_actions, depth, num_virtual, visit_counts_s,
+           visit_counts_sa, virtual_visits_s, virtual_visits_sa, heuristic,
+           outcome):
+    """
+    Runs the backup algorithm on the network to update the values along
+    the nodes and paths based on the game's outcome. The first num_virtual
+    nodes and actions of the path got a virtual visit from
+    add_virtual_visits, which is removed here. The heuristic is the mean
+    outcome of the finished simulations only, so it is updated using the
+    real visit counts.
+    The backup is bound by memory access rather than arithmetic, so all
+    updates of a node are done in one pass, reading each count once.
+    """
+    for i in range(depth):
+        node = path_nodes[i]
+        action_num = path_actions[i]
+        if i < num_virtual:
+            virtual_visits_s[node] -= 1
+            virtual_visits_sa[node, action_num] -= 1
+        visit_counts_s[node] += 1
+        visits = visit_counts_sa[node, action_num] + 1
+        visit_counts_sa[node, action_num] = visits
+        heuristic[node, action_num] += (outcome -
+                                        heuristic[node, action_num]) / visits
 
 
 class MonteCarloTreeSearch:
     """
     Class for running Monte Carlo Tree search on a simworld.
+    The tree is stored as parallel numpy arrays indexed by an integer node id,
+    where the second axis of the arrays is the action number. The walk down
+    the tree and the backup are compiled with numba, while the simworld and
+    the rollouts using the ANET stay in python.
+    Simulations are run in batches whose rollouts advance in lockstep, such
+    that the ANET is called once per move for the whole batch.
+    Equal states reached through different paths share one node, making the
+    tree a graph. When a simulation takes a new edge to a node which is
+    already in the graph, or an edge to a final state, the known value is
+    backed up instead of running a rollout.
     """
+    final_child = -2  # Marks an action leading to a final state in children
 
     def __init__(self,
                  board,
                  default_policy,
                  simulations: int = 500,
-                 default_exp_const: int = 1):
+                 default_exp_const: int = 1,
+                 rollout_batch_size: int = 1):
         self.board = board  # Of type simworld
         self.epsilon = 0.1
         self.default_policy = default_policy
         self.default_exp_const = default_exp_const
         self.simulations = simulations  # M-value for number of simulations
+        # Number of simulations whose rollouts are run together
+        self.rollout_batch_size = rollout_batch_size
+        self.move_size = board.get_move_size()  # Length of the action vector
         self.state = None
-        self.tree = set()
-        self.heuristic = {}
-        self.visit_counts_s = {}
-        self.visit_counts_sa = {}
+        self.tree = {}  # Maps each state in the tree to its node id
+        self.node_states = []  # The state of each node
+        self.node_count = 0
+        self.player_signs = None  # 1 if p0 is to play in the node, -1 if p1
+        self.legal_mask = None  # Whether each action is legal in the node
+        self.visit_counts_s = None
+        self.visit_counts_sa = None
+        # Visits of the simulations in the batch whose rollouts are not done,
+        # only used when selecting actions
+        self.virtual_visits_s = None
+        self.virtual_visits_sa = None
+        self.heuristic = None
+        self.children = None  # Node id of each child, -1 if not yet known
+        self.final_outcomes = None  # Outcome of each action to a final state
+        self.path_nodes = None  # Nodes visited in each simulation of a batch
+        self.path_actions = None  # Actions performed in each simulation
+        # Number of simulations run since the tree was reset, no visit count
+        # can be larger than this
+        self.simulations_run = 0
+        self.sqrt_log_visits = None  # sqrt(log(1 + n)) for visit counts n
+        self.inv_sqrt_visits = None  # 1 / sqrt(1 + n) for visit counts n
+        self.initialize_variables()
 
     def initialize_variables(self):
         """
         Resets the variables to their initial state.
         """
-        self.tree = set()
-        self.heuristic = {}
-        self.visit_counts_s = {}
-        self.visit_counts_sa = {}
+        capacity = self.simulations + 1
+        self.tree = {}
+        self.node_states = []
+        self.node_count = 0
+        self.player_signs = np.zeros(capacity, dtype=np.int8)
+        self.legal_mask = np.zeros((capacity, self.move_size), dtype=bool)
+        self.visit_counts_s = np.zeros(capacity, dtype=np.int32)
+        self.visit_counts_sa = np.zeros((capacity, self.move_size),
+                                        dtype=np.int32)
+        self.virtual_visits_s = np.zeros(capacity, dtype=np.int32)
+        self.virtual_visits_sa = np.zeros((capacity, self.move_size),
+                                          dtype=np.int32)
+        self.heuristic = np.zeros((capacity, self.move_size),
+                                  dtype=np.float32)
+        self.children = -np.ones((capacity, self.move_size), dtype=np.int32)
+        self.final_outcomes = np.zeros((capacity, self.move_size),
+                                       dtype=np.int8)
+        # A path down the tree never visits the same node twice
+        self.path_nodes = np.zeros((self.rollout_batch_size, capacity),
+                                   dtype=np.int32)
+        self.path_actions = np.zeros((self.rollout_batch_size, capacity),
+                                     dtype=np.int32)
+        self.simulations_run = 0
+        self.sqrt_log_visits = np.zeros(0)
+        self.inv_sqrt_visits = np.zeros(0)
 
     def mc_tree_search(self, root_state):
         """
         Performs MCTS for self.simulations number of times. Each resulting in
-        a new node in the tree being created.
+        a new node in the tree being created. The subtree below the root state
+        is kept from the previous searches, the rest of the tree is removed.
         """
-        for _ in range(self.simulations):
-            self.simulate(root_state)  # Run simulation from root state
+        self.simulations_run += self.simulations
+        self.grow_exploration_tables(self.simulations_run + 1)
+        # Node id of the root, -1 until the root has been added to the tree
+        root_node = self.prune_tree(self.tree.get(root_state, -1))
+        for first in range(0, self.simulations, self.rollout_batch_size):
+            # Run a batch of simulations from root state
+            batch_size = min(self.rollout_batch_size, self.simulations - first)
+            self.simulate(root_state, root_node, batch_size)
+            # The first node of every path is the root
+            root_node = self.path_nodes[0, 0]
         self.state = root_state
         # Return an action and the distribution from the root state
         return self.select_action(root_state,
                                   0), self.get_visited_distribution(root_state)
 
-    def simulate(self, root_state):
+    def simulate(self, root_state, root_node, batch_size):
         """
-        Simulates one run of the game from the root state. Walks down the tree
-        and performs rollout if a leaf node is reached before the simulated
-        game is over.
+        Simulates batch_size runs of the game from the root state. Each run
+        walks down the tree and performs rollout if a leaf node is reached
+        before the simulated game is over. The node id of the root state is
+        given to avoid looking it up in the tree for every simulation, -1 if
+        it is not in the tree.
         """
-        self.state = root_state
-        # Go down the tree
-        visited_states, performed_actions = self.simulate_tree()
-        # Run rollout after leaf-node is reached
-        outcome, first_action = self.simulate_default()
-        if first_action is not None:
-            performed_actions.append(first_action)
-        # Run backup on the tree after rollout has reached final state
-        self.backup(visited_states, performed_actions, outcome)
-
-    def simulate_tree(self):
-        """
-        Simulates the walk of moves down the tree itself.
-        """
-        exploration = self.default_exp_const
-        visited_states = []  # Keep track of visited tree-nodes
-        performed_actions = []
-        while not self.board.state_is_final(self.state):
-            state_t = self.state
-            visited_states.append(state_t)
-            # If state is leaf-node add it to the tree
-            if state_t not in self.tree:
-                self.new_node(state_t)
-                return visited_states, performed_actions
-            # Else, keep going down the tree by doing moves
-            action = self.select_action(state_t, exploration)
-            performed_actions.append(action)
-            self.state = self.board.get_child_state(self.state, action)
-        return visited_states, performed_actions
-
-    def simulate_default(self):
-        """
-        Simulates the rollout of default moves after a leaf node in the tree
-        is reached. The default policy is used to determine the moves.
-        Returns the first move performed by the ANET, in order for backup to
-        work properly.
-        """
-        # Use ANET to play game until a final state is reached.
-        first_action = None
-        if not self.board.state_is_final(self.state):
-            first_action = self.default_policy.propose_action(
-                self.state, epsilon=self.epsilon)
-            self.state = self.board.get_child_state(self.state, first_action)
-        while not self.board.state_is_final(self.state):
-            action = self.default_policy.propose_action(self.state,
-                                                        epsilon=self.epsilon)
-            self.state = self.board.get_child_state(self.state, action)
-        return self.board.winner_is_p0(self.state), first_action
+        leaf_states = []
+        depths = []
+        num_virtual = []
+        outcomes = []  # None until the rollout from the leaf-node is done
+        for i in range(batch_size):
+            self.state = root_state
+            # Go down the tree
+            depth, leaf_added, outcome = self.simulate_tree(root_node, i)
+            root_node = self.path_nodes[i, 0]
+            # Add virtual visits along the path until its rollout is done, to
+            # make the following simulations in the batch explore other paths.
+            # The backup turns them into the real visits.
+            num_actions = depth - 1 if leaf_added else depth
+            add_virtual_visits(self.path_nodes[i], self.path_actions[i],
+                               num_actions, self.virtual_visits_s,
+                               self.virtual_visits_sa)
+            leaf_states.append(self.state)
+            depths.append(depth)
+            num_virtual.append(num_actions)
+            outcomes.append(outcome)
+        # Run rollouts after leaf-nodes are reached
+        rollouts = [i for i in range(batch_size) if outcomes[i] is None]
+        rollout_outcomes, first_actions = self.simulate_default(
+            [leaf_states[i] for i in rollouts])
+        for i, outcome, first_action in zip(rollouts, rollout_outcomes,
+                                            first_actions):
+            outcomes[i] = outcome
+            if first_action is not None:
+                self.path_actions[i, depths[i] - 1] = (
+                    self.board.get_action_num_from_one_hot(first_action))
+        for i in range(batch_size):
+            # Run backup on the tree after rollout has reached final state
+            backup(self.path_nodes[i], self.path_actions[i], depths[i],
+                   num_virtual[i], self.visit_counts_s, self.visit_counts_sa,
+                   self.virtual_visits_s, self.virtual_visits_sa,
+                   self.heuristic, float(outcomes[i]))
+
+    def simulate_tree(self, node, path_index):
+        """
+        Simulates the walk of moves down the tree itself, starting in the
+        given node (-1 if self.state is not in the tree). The visited nodes
+        and the action numbers performed in them are stored in row path_index
+        of self.path_nodes and self.path_actions. Returns the length of the
+        path, whether a new leaf-node was added at the end of it, and the
+        outcome to back up if no rollout is needed (None otherwise).
+        """
+        exploration = float(self.default_exp_const)
+        depth = 0
+        while node >= 0:
+            depth = walk_tree(node, self.player_signs, self.visit_counts_s,
+                              self.visit_counts_sa, self.virtual_visits_s,
+                              self.virtual_visits_sa, self.heuristic,
+                              self.legal_mask, self.children, exploration,
+                              self.sqrt_log_visits, self.inv_sqrt_visits,
+                              self.path_nodes[path_index],
+                              self.path_actions[path_index], depth)
+            # The child of the last node in the path is not linked yet, or
+            # it is a final state
+            parent = self.path_nodes[path_index, depth - 1]
+            action_num = self.path_actions[path_index, depth - 1]
+            if self.children[parent, action_num] == self.final_child:
+                return depth, False, self.final_outcomes[parent, action_num]
+            self.state = self.board.get_child_state(
+                self.node_states[parent],
+                self.board.get_one_hot_action(action_num))
+            node = self.tree.get(self.state, -1)
+            if node >= 0:
+                # A new edge to a node already in the graph
+                self.children[parent, action_num] = node
+                value = self.get_node_value(node)
+                if value is not None:
+                    return depth, False, value
+        # If a final state is reached, there is no leaf-node to add
+        if self.board.state_is_final(self.state):
+            outcome = self.board.winner_is_p0(self.state)
+            if depth > 0:
+                parent = self.path_nodes[path_index, depth - 1]
+                action_num = self.path_actions[path_index, depth - 1]
+                self.children[parent, action_num] = self.final_child
+                self.final_outcomes[parent, action_num] = outcome
+            return depth, False, outcome
+        # Add the non-final leaf-node to the tree, this may grow the arrays
+        node = self.new_node(self.state)
+        if depth > 0:
+            self.children[self.path_nodes[path_index, depth - 1],
+                          self.path_actions[path_index, depth - 1]] = node
+        self.path_nodes[path_index, depth] = node
+        return depth + 1, True, None
+
+    def get_node_value(self, node):
+        """
+        Returns the value of the given node, the mean outcome of all the
+        finished simulations which have passed through it. Returns None if no
+        simulation through it has finished yet.
+        """
+        # Only the real visits count, the heuristic of an action whose visits
+        # are all virtual is not a value yet
+        total_visits = int(self.visit_counts_s[node])
+        if total_visits == 0:
+            return None
+        visits = self.visit_counts_sa[node]
+        return float(visits @ self.heuristic[node]) / total_visits
+
+    def simulate_default(self, states):
+        """
+        Simulates the rollouts of default moves from each of the given states,
+        which are the states reached when walking down the tree. The default
+        policy is used to determine the moves, with one call for all the
+        unfinished rollouts per move. Returns the outcome of each rollout and
+        the first move performed by the ANET in each of them, in order for
+        backup to work properly.
+        """
+        states = list(states)
+        first_actions = [None] * len(states)
+        # Use ANET to play the games until final states are reached.
+        unfinished = [
+            i for i, state in enumerate(states)
+            if not self.board.state_is_final(state)
+        ]
+        while unfinished:
+            actions = self.default_policy.propose_action_batch(
+                [states[i] for i in unfinished], epsilon=self.epsilon)
+            still_unfinished = []
+            for i, action in zip(unfinished, actions):
+                if first_actions[i] is None:
+                    first_actions[i] = action
+                states[i] = self.board.get_child_state(states[i], action)
+                if not self.board.state_is_final(states[i]):
+                    still_unfinished.append(i)
+            unfinished = still_unfinished
+        outcomes = [self.board.winner_is_p0(state) for state in states]
+        return outcomes, first_actions
 
     def select_action(self, state, exploration):
         """
-        Selects an action to perform when walking down the tree. Actions never
-        performed before, or actions which have been performed relatively few
-        number of times are favoured.
-        """
-        legal_actions = self.board.get_legal_actions(state)
-        action_values = []
-        # Black to play, maximize reward
-        if self.board.p0_to_play(state):
-            for action in legal_actions:
-                action_value = self.heuristic[
-                    (state, action)] + exploration * np.sqrt(
-                        np.log(self.visit_counts_s[state]) /
-                        (self.visit_counts_sa[(state, action)] + 1))
-                action_values.append(action_value)
-            chosen_action_index = np.argmax(np.array(action_values))
-            chosen_action = legal_actions[chosen_action_index]
-        # Red to play, minimize reward
-        else:
-            for action in legal_actions:
-                action_value = self.heuristic[
-                    (state, action)] - exploration * np.sqrt(
-                        np.log(self.visit_counts_s[state]) /
-                        (self.visit_counts_sa[(state, action)] + 1))
-                action_values.append(action_value)
-            chosen_action_index = np.argmin(np.array(action_values))
-            chosen_action = legal_actions[chosen_action_index]
-        return chosen_action
-
-    def backup(self, visited_states, performed_actions, outcome):
-        """
-        Runs the backup algorithm on the network to update the values along
-        the nodes and paths based on the game's outcome.
-        """
-        for stat_act in zip(visited_states, performed_actions):
-            self.visit_counts_s[
-                stat_act[0]] = self.visit_counts_s[stat_act[0]] + 1
-            self.visit_counts_sa[stat_act] = self.visit_counts_sa[stat_act] + 1
-            self.heuristic[stat_act] = self.heuristic[stat_act] + (
-                outcome -
-                self.heuristic[stat_act]) / self.visit_counts_sa[stat_act]
+        Selects an action to perform from the given state, which must be in
+        the tree. Returns the action as a one-hot encoded action.
+        """
+        action_num = select_action_num(self.tree[state], self.player_signs,
+                                       self.visit_counts_s,
+                                       self.visit_counts_sa,
+                                       self.virtual_visits_s,
+                                       self.virtual_visits_sa, self.heuristic,
+                                       self.legal_mask, float(exploration),
+                                       self.sqrt_log_visits,
+                                       self.inv_sqrt_visits)
+        return self.board.get_one_hot_action(action_num)
+
+    def grow_exploration_tables(self, size):
+        """
+        Makes sure the lookup tables for the exploration term cover all visit
+        counts below the given size. The tables at least double when they
+        grow.
+        """
+        if len(self.sqrt_log_visits) >= size:
+            return
+        visits = np.arange(max(size, 2 * len(self.sqrt_log_visits)))
+        self.sqrt_log_visits = np.sqrt(np.log1p(visits))
+        self.inv_sqrt_visits = 1 / np.sqrt(1 + visits)
 
     def new_node(self, state_t):
         """
         Creates a new node in the tree and sets all its values to 0.
+        Returns the node id of the new node.
         """
-        self.tree.add(state_t)
-        self.visit_counts_s[state_t] = 0
+        if self.node_count == len(self.visit_counts_s):
+            self.grow_tree()
+        node = self.node_count
+        self.node_count += 1
+        self.tree[state_t] = node
+        self.node_states.append(state_t)
+        self.player_signs[node] = 1 if self.board.p0_to_play(state_t) else -1
         legal_actions = self.board.get_legal_actions(state_t)
-        for action in legal_actions:
-            self.visit_counts_sa[(state_t, action)] = 0
-            self.heuristic[(state_t, action)] = 0
+        self.legal_mask[node] = np.sum(legal_actions, axis=0) > 0
+        return node
 
-    def get_visited_distribution(self, state):
+    def prune_tree(self, root_node):
         """
-        Returns the visit counts along the exiting paths from the given state.
+        Removes all nodes which can not be reached from the given root node
+        through the known children, and renumbers the remaining nodes from 0.
+        Returns the new node id of the root, -1 if the root was -1, in which
+        case all nodes are removed.
         """
-        # Get all legal actions in state
-        legal_actions = self.board.get_legal_actions(state)
-
-        # Create a list of the visit counts along each action path
-        visited_vector = []
-        for action in legal_actions:
-            visited_vector.append(self.visit_counts_sa[(state, action)])
+        # Find the reachable nodes one level at a time
+        reachable = np.zeros(self.node_count, dtype=bool)
+        if root_node >= 0:
+            reachable[root_node] = True
+            frontier = np.array([root_node])
+            while len(frontier) > 0:
+                children = self.children[frontier]
+                children = np.unique(children[children >= 0])
+                frontier = children[~reachable[children]]
+                reachable[frontier] = True
+        kept = np.flatnonzero(reachable)
+        num_kept = len(kept)
+        new_ids = np.zeros(self.node_count, dtype=np.int32)
+        new_ids[kept] = np.arange(num_kept)
+        # Move the kept nodes to the start of the arrays and reset the rest
+        children = self.children[kept]
+        self.children[:num_kept] = np.where(
+            children >= 0, new_ids[np.maximum(children, 0)], children)
+        self.children[num_kept:self.node_count] = -1
+        for array in (self.player_signs, self.legal_mask, self.visit_counts_s,
+                      self.visit_counts_sa, self.virtual_visits_s,
+                      self.virtual_visits_sa, self.heuristic,
+                      self.final_outcomes):
+            array[:num_kept] = array[kept]
+            array[num_kept:self.node_count] = 0
+        self.node_states = [self.node_states[node] for node in kept]
+        self.tree = {state: node for node, state in enumerate(self.node_states)}
+        self.node_count = num_kept
+        return new_ids[root_node] if root_node >= 0 else -1
 
-        # Normalize the visit counts vector
-        visited_vector = np.array(visited_vector, dtype=float)
-        visited_vector /= visited_vector.sum()
+    def grow_tree(self):
+        """
+        Doubles the number of nodes the tree arrays have room for.
+        """
+        self.player_signs = np.concatenate(
+            (self.player_signs, np.zeros_like(self.player_signs)))
+        self.legal_mask = np.concatenate(
+            (self.legal_mask, np.zeros_like(self.legal_mask)))
+        self.visit_counts_s = np.concatenate(
+            (self.visit_counts_s, np.zeros_like(self.visit_counts_s)))
+        self.visit_counts_sa = np.concatenate(
+            (self.visit_counts_sa, np.zeros_like(self.visit_counts_sa)))
+        self.virtual_visits_s = np.concatenate(
+            (self.virtual_visits_s, np.zeros_like(self.virtual_visits_s)))
+        self.virtual_visits_sa = np.concatenate(
+            (self.virtual_visits_sa, np.zeros_like(self.virtual_visits_sa)))
+        self.heuristic = np.concatenate(
+            (self.heuristic, np.zeros_like(self.heuristic)))
+        self.children = np.concatenate(
+            (self.children, -np.ones_like(self.children)))
+        self.final_outcomes = np.concatenate(
+            (self.final_outcomes, np.zeros_like(self.final_outcomes)))
+        self.path_nodes = np.concatenate(
+            (self.path_nodes, np.zeros_like(self.path_nodes)), axis=1)
+        self.path_actions = np.concatenate(
+            (self.path_actions, np.zeros_like(self.path_actions)), axis=1)
 
-        # Return the distribution of visit counts as a list with length equal to
-        # the total number of actions possible disregarding the current state.
-        action_visited = np.zeros(len(legal_actions[0]))
-        for i, action in enumerate(legal_actions):
-            action_visited += visited_vector[i] * np.array(action)
-        return action_visited
+    def get_visited_distribution(self, state):
+        """
+        Returns the visit counts along the exiting paths from the given state.
+        """
+        node = self.tree[state]
+        # The visit counts are indexed by action number and are 0 for all
+        # illegal actions. Normalizing them gives the distribution as a vector
+        # with length equal to the total number of actions possible
+        # disregarding the current state.
+        visited_vector = self.visit_counts_sa[node].astype(float)
+        return visited_vector / visited_vector.sum()
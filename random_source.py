@@ -0,0 +1,15 @@
+"""Haakon8855"""
+
+import numpy as np
+
+# Random number generator used for all sampling of moves and training cases,
+# such that a run can be seeded in one place.
+rng = np.random.default_rng()
+
+
+def seed(value):
+    """
+    Seeds the shared random number generator. The generator is reseeded in
+    place, so modules which have already imported it use the new seed.
+    """
+    rng.bit_generator.state = np.random.default_rng(value).bit_generator.state
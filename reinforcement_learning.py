@@ -2,6 +2,8 @@
 
 import numpy as np
 
+from random_source import rng
+
 
 class ReinforcementLearner():
     """
@@ -18,11 +20,21 @@ class ReinforcementLearner():
                  num_games: int = 100,
                  epsilon: float = 0.1,
                  draw_board: bool = False,
-                 epochs_per_episode: int = 100):
+                 epochs_per_episode: int = 100,
+                 rbuf_capacity: int = 20000,
+                 minibatch_size: int = 0):
         self.num_policies = num_policies  # Number of policies to save
         self.num_games = num_games  # Number of actual episodes to run
-        self.rbuf_distributions = []
-        self.rbuf_states = []
+        # RBUF is a ring buffer of preallocated arrays, where the oldest cases
+        # are overwritten when it is full.
+        self.rbuf_states = np.zeros(
+            (rbuf_capacity, sim_world.get_state_size()), dtype=np.float32)
+        self.rbuf_distributions = np.zeros(
+            (rbuf_capacity, sim_world.get_move_size()), dtype=np.float32)
+        self.rbuf_head = 0  # Index to write the next case to
+        self.rbuf_size = 0  # Number of cases in RBUF
+        # Number of cases to train on after each episode, 0 means all of RBUF
+        self.minibatch_size = minibatch_size
         self.epsilon = epsilon  # Exploration value to choose actual move randomly
         self.draw_board = draw_board  # Whether to draw the board during training or not
         self.epochs_per_episode = epochs_per_episode
@@ -30,6 +42,9 @@ class ReinforcementLearner():
         self.sim_world = sim_world
         self.actor_network = actor_network
         self.mcts = mcts
+        # The Nim transitions are generated for the given game parameters
+        if self.sim_world.identifier == "nim":
+            self.sim_world.specialize()
 
         self.weights_index = weights_index  # Which weights to load when playing against computer
         # The intervals at which to save the current weights of the ANET
@@ -51,8 +66,8 @@ class ReinforcementLearner():
         self.actor_network.save_weights(self.save_count)
         self.save_count += 1
         # Clear replay buffer RBUF
-        self.rbuf_distributions = []
-        self.rbuf_states = []
+        self.rbuf_head = 0
+        self.rbuf_size = 0
         # Randomly initialize ANET
         for i in range(self.num_games):
             # get initial state
@@ -65,21 +80,14 @@ class ReinforcementLearner():
                 # and run a simulated game from the root state.
                 action, distribution = self.mcts.mc_tree_search(state)
                 # Append distribution and state to RBUF
-                self.rbuf_distributions.append(distribution)
-                self.rbuf_states.append(state)
+                self.add_to_rbuf(state, distribution)
                 # Choose actual move from D
                 chosen_action_index = np.argmax(distribution)
-                if np.random.random() < self.epsilon:
-                    # Choose one random legal action
-                    # Copy distribution
-                    random_distribution = distribution.copy()
-                    # Set all probabilities larger than 0 to 1
-                    random_distribution[random_distribution > 0] = 1
-                    # Normalize vector to choose uniformly between legal actions
-                    random_distribution = random_distribution / random_distribution.sum(
-                    )
-                    chosen_action_index = np.random.choice(
-                        len(random_distribution), 1, p=random_distribution)[0]
+                if rng.random() < self.epsilon:
+                    # Choose one random legal action, uniformly between all
+                    # actions with a probability larger than 0
+                    chosen_action_index = rng.choice(
+                        np.flatnonzero(distribution > 0))
                 action = self.sim_world.get_one_hot_action(chosen_action_index)
                 # Perform chosen action
                 state = self.sim_world.get_child_state(state, action)
@@ -98,12 +106,31 @@ class ReinforcementLearner():
         self.actor_network.save_weights(self.save_count)
         self.save_count += 1
 
+    def add_to_rbuf(self, state, distribution):
+        """
+        Adds a case to RBUF, overwriting the oldest case if RBUF is full.
+        """
+        self.rbuf_states[self.rbuf_head] = state
+        self.rbuf_distributions[self.rbuf_head] = distribution
+        self.rbuf_head = (self.rbuf_head + 1) % len(self.rbuf_states)
+        self.rbuf_size = min(self.rbuf_size + 1, len(self.rbuf_states))
+
     def train_actor_network(self):
         """
-        Trains the actor network on cases from RBUF.
+        Trains the actor network on cases from RBUF. Trains on a random
+        minibatch of the cases if a minibatch size is set.
         """
-        self.actor_network.fit(train_x=np.array(self.rbuf_states),
-                               train_y=np.array(self.rbuf_distributions),
+        if 0 < self.minibatch_size < self.rbuf_size:
+            cases = rng.choice(self.rbuf_size,
+                               self.minibatch_size,
+                               replace=False)
+            train_x = self.rbuf_states[cases]
+            train_y = self.rbuf_distributions[cases]
+        else:
+            train_x = self.rbuf_states[:self.rbuf_size]
+            train_y = self.rbuf_distributions[:self.rbuf_size]
+        self.actor_network.fit(train_x=train_x,
+                               train_y=train_y,
                                epochs=self.epochs_per_episode)
 
     def play_hex(self):
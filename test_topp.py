@@ -41,6 +41,9 @@ class TestTopp:
         mcts_conf = self.config['MCTS']
         self.sim_games = int(mcts_conf['sim_games'])
         self.mcts_epsilon = float(mcts_conf['epsilon'])
+        # Configs without the key run the simulations one at a time
+        self.rollout_batch_size = mcts_conf.getint('rollout_batch_size',
+                                                   fallback=1)
 
         # Fetch config for the simworld
         simworld_conf = self.config['SIMWORLD']
@@ -69,8 +72,11 @@ class TestTopp:
                                           self.sim_world, self.weights_path,
                                           self.layer_sizes, self.layer_acts,
                                           self.optimizer, self.lrate)
-        self.mcts = MonteCarloTreeSearch(self.sim_world, self.actor_network,
-                                         self.sim_games)
+        self.mcts = MonteCarloTreeSearch(
+            self.sim_world,
+            self.actor_network,
+            self.sim_games,
+            rollout_batch_size=self.rollout_batch_size)
         self.reinforcement_learner = ReinforcementLearner(
             self.sim_world, self.actor_network, self.mcts, self.num_policies,
             self.weights_index, self.num_games, self.rl_epsilon,
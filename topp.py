@@ -1,10 +1,15 @@
 """Haakon8855"""
 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import sleep
+
 import numpy as np
+import tensorflow as tf
 from matplotlib import pyplot as plt
-from time import sleep
 
 from actor_network import ActorNetwork
+from random_source import rng
 
 
 class Tournament():
@@ -20,7 +25,8 @@ class Tournament():
                  network_layer_sizes: list,
                  network_layer_acts: list,
                  optimizer_str: str,
-                 draw_board: bool = False):
+                 draw_board: bool = False,
+                 parallel: bool = True):
         self.sim_world = sim_world
         self.num_policies = num_policies
         self.num_games_in_series = num_games_in_series
@@ -30,35 +36,65 @@ class Tournament():
         self.optimizer_str = optimizer_str
         self.draw_board = draw_board  # Whether to draw the board or not during TOPP
         self.animation_sleep_duration = 0.5  # Time to sleep between making a move
+        # Whether to play the series in parallel worker processes. The board
+        # is drawn to a single file, so drawing requires playing in sequence.
+        self.parallel = parallel and not draw_board
 
+        # The policies are loaded when playing in this process, the workers
+        # load their own policies when playing in parallel
         self.policies = []
         self.policies_win_count = [0] * num_policies
-        self.init_policies()
+        if not self.parallel:
+            self.init_policies()
 
     def init_policies(self):
         """
         Loads all saved weights and saves the instances of ActorNetwork (policies).
+        Does nothing if the policies are already loaded.
         """
+        if self.policies:
+            return
         for i in range(self.num_policies):
-            input_size = self.sim_world.get_state_size()
-            output_size = self.sim_world.get_move_size()
-            save_path = self.weights_path + str(i)
-            network = ActorNetwork(input_size, output_size, self.sim_world,
-                                   save_path, self.network_layer_sizes,
-                                   self.network_layer_acts, self.optimizer_str)
-            network.load_weights()
-            self.policies.append(network)
+            self.policies.append(
+                load_policy(self.sim_world, self.weights_path + str(i),
+                            self.network_layer_sizes, self.network_layer_acts,
+                            self.optimizer_str))
 
     def run(self):
         """
         Runs a tournament between the loaded policies.
         """
-        for i in range(len(self.policies) - 1):
-            for j in range(i + 1, len(self.policies)):
+        pairs = [(i, j) for i in range(self.num_policies - 1)
+                 for j in range(i + 1, self.num_policies)]
+        if self.parallel:
+            self.play_series_in_parallel(pairs)
+        else:
+            for i, j in pairs:
                 self.play_one_series(i, j)
         print(f"Wins for each agent was: {self.policies_win_count}")
         self.plot_policies_win_count()
 
+    def play_series_in_parallel(self, pairs):
+        """
+        Plays the series between each pair of policies in a pool of worker
+        processes, where each worker loads the two policies from file.
+        """
+        # Tensorflow does not support being forked, so the workers are spawned
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(mp_context=context,
+                                 initializer=init_worker) as executor:
+            futures = [
+                executor.submit(play_series_from_files, self.sim_world,
+                                self.weights_path, self.network_layer_sizes,
+                                self.network_layer_acts, self.optimizer_str,
+                                index_a, index_b, self.num_games_in_series)
+                for index_a, index_b in pairs
+            ]
+            for future in as_completed(futures):
+                index_a, index_b, wins_a, wins_b = future.result()
+                self.policies_win_count[index_a] += wins_a
+                self.policies_win_count[index_b] += wins_b
+
     def plot_policies_win_count(self):
         """
         Plots the win counts for each policy/agent.
@@ -72,53 +108,158 @@ class Tournament():
         Plays one series between player at index_a and player at index_b,
         G games where each policy alternates playing as black.
         """
-        players = [index_a, index_b]
-        for _ in range(self.num_games_in_series):
-            self.play_one_game(players[0], players[1])
-            players.reverse()
+        self.init_policies()
+        wins_a, wins_b = play_one_series(self.sim_world, self.policies,
+                                         index_a, index_b,
+                                         self.num_games_in_series,
+                                         self.draw_board,
+                                         self.animation_sleep_duration)
+        self.policies_win_count[index_a] += wins_a
+        self.policies_win_count[index_b] += wins_b
 
     def play_one_game(self, index_0, index_1):
         """
         Play one hex game between two policies.
         """
-        player_0 = self.policies[index_0]
-        player_1 = self.policies[index_1]
-        title = f"Agent {index_0} (black) vs. Agent {index_1} (red)"
-
-        state = self.sim_world.get_initial_state()
-        while True:
-            # Black makes a move:
-            action, distribution = player_0.propose_action(
-                state, get_distribution=True)
-            # Choose action randomly based on the output from the network
-            distribution /= distribution.sum()
-            distribution = distribution.copy()[0]
-            action_num = np.random.choice(len(distribution), 1,
-                                          p=distribution)[0]
-            action = self.sim_world.get_one_hot_action(action_num)
-            state = self.sim_world.get_child_state(state, action)
-            if self.draw_board:
-                self.sim_world.show_visible_board(state, title=title)
-                sleep(self.animation_sleep_duration)
-            final = self.sim_world.state_is_final(state)
-            if final:
-                self.policies_win_count[index_0] += 1
-                return
-
-            # Red makes a move:
-            action, distribution = player_1.propose_action(
-                state, get_distribution=True)
-            # Choose action randomly based on the output from the network
-            distribution /= distribution.sum()
-            distribution = distribution.copy()[0]
-            action_num = np.random.choice(len(distribution), 1,
-                                          p=distribution)[0]
-            action = self.sim_world.get_one_hot_action(action_num)
-            state = self.sim_world.get_child_state(state, action)
-            if self.draw_board:
-                self.sim_world.show_visible_board(state, title=title)
-                sleep(self.animation_sleep_duration)
-            final = self.sim_world.state_is_final(state)
-            if final:
-                self.policies_win_count[index_1] += 1
-                return
+        self.init_policies()
+        winner = play_one_game(self.sim_world, self.policies, index_0, index_1,
+                               self.draw_board, self.animation_sleep_duration)
+        self.policies_win_count[winner] += 1
+
+
+def load_policy(sim_world,
+                save_path,
+                network_layer_sizes,
+                network_layer_acts,
+                optimizer_str,
+                num_threads=None):
+    """
+    Returns an instance of ActorNetwork (policy) with the weights saved at
+    the given path. Its lite model uses num_threads threads, or the default
+    of tensorflow lite if None.
+    """
+    input_size = sim_world.get_state_size()
+    output_size = sim_world.get_move_size()
+    network = ActorNetwork(input_size,
+                           output_size,
+                           sim_world,
+                           save_path,
+                           network_layer_sizes,
+                           network_layer_acts,
+                           optimizer_str,
+                           num_threads=num_threads)
+    network.load_weights()
+    return network
+
+
+def init_worker():
+    """
+    Limits tensorflow to one thread in each worker process, as the series
+    themselves are played in parallel. The predictions are run by tensorflow
+    lite, which does not use these settings, so the policies of the workers
+    are loaded with one thread as well.
+    """
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def play_series_from_files(sim_world, weights_path, network_layer_sizes,
+                           network_layer_acts, optimizer_str, index_a, index_b,
+                           num_games_in_series):
+    """
+    Loads the policies at index_a and index_b from file and plays one series
+    between them. Runs in a worker process, so the policies use one thread.
+    Returns the indices along with the number of wins for each of the
+    policies.
+    """
+    policies = {
+        index: load_policy(sim_world,
+                           weights_path + str(index),
+                           network_layer_sizes,
+                           network_layer_acts,
+                           optimizer_str,
+                           num_threads=1)
+        for index in (index_a, index_b)
+    }
+    wins_a, wins_b = play_one_series(sim_world, policies, index_a, index_b,
+                                     num_games_in_series)
+    return index_a, index_b, wins_a, wins_b
+
+
+def play_one_series(sim_world,
+                    policies,
+                    index_a,
+                    index_b,
+                    num_games_in_series,
+                    draw_board=False,
+                    animation_sleep_duration=0.5):
+    """
+    Plays one series between player at index_a and player at index_b,
+    G games where each policy alternates playing as black. Returns the number
+    of wins for each of the players.
+    """
+    wins = {index_a: 0, index_b: 0}
+    players = [index_a, index_b]
+    for _ in range(num_games_in_series):
+        winner = play_one_game(sim_world, policies, players[0], players[1],
+                               draw_board, animation_sleep_duration)
+        wins[winner] += 1
+        players.reverse()
+    return wins[index_a], wins[index_b]
+
+
+def play_one_game(sim_world,
+                  policies,
+                  index_0,
+                  index_1,
+                  draw_board=False,
+                  animation_sleep_duration=0.5):
+    """
+    Play one hex game between two policies. Returns the index of the winner.
+    """
+    player_0 = policies[index_0]
+    player_1 = policies[index_1]
+    title = f"Agent {index_0} (black) vs. Agent {index_1} (red)"
+
+    state = sim_world.get_initial_state()
+    while True:
+        # Black makes a move:
+        action, distribution = player_0.propose_action(state,
+                                                       get_distribution=True)
+        # Choose action randomly based on the output from the network
+        action_num = sample_action_num(distribution[0])
+        action = sim_world.get_one_hot_action(action_num)
+        state = sim_world.get_child_state(state, action)
+        if draw_board:
+            sim_world.show_visible_board(state, title=title)
+            sleep(animation_sleep_duration)
+        final = sim_world.state_is_final(state)
+        if final:
+            return index_0
+
+        # Red makes a move:
+        action, distribution = player_1.propose_action(state,
+                                                       get_distribution=True)
+        # Choose action randomly based on the output from the network
+        action_num = sample_action_num(distribution[0])
+        action = sim_world.get_one_hot_action(action_num)
+        state = sim_world.get_child_state(state, action)
+        if draw_board:
+            sim_world.show_visible_board(state, title=title)
+            sleep(animation_sleep_duration)
+        final = sim_world.state_is_final(state)
+        if final:
+            return index_1
+
+
+def sample_action_num(distribution):
+    """
+    Samples an action number with probability proportional to the given
+    unnormalized distribution, using the Gumbel-max trick: the largest of the
+    log-probabilities plus Gumbel noise is distributed like the distribution.
+    Illegal actions have a probability of 0, so their logarithm is -inf and
+    they are never chosen.
+    """
+    with np.errstate(divide="ignore"):
+        logits = np.log(distribution)
+    return int(np.argmax(logits + rng.gumbel(size=logits.shape)))